@@ -16,6 +16,8 @@ Query Client can be implemented in any programming language & any desired behavi
 By implementing a server architecture, that only reacts to incoming requests,
 without performing computationally expensive tasks, the server can be run
 with minimal hardware requirements, e.g. on a Raspberry Pi or a cloud server.
+(The only exception is the optional background transcoding of videos into
+lower resolution variants, see video_transcoder.py)
 
 Additionally, the Query Client script could for example be run from a laptop, and
 can be disconnected from the web at any given moment, without affecting the server.
@@ -34,6 +36,7 @@ the server can ensure, that unevaluated Queries due to unexpected events
 """
 
 import argparse
+import io
 import os
 import queue
 from urllib.parse import unquote
@@ -42,9 +45,16 @@ import flask
 import waitress
 from flask import Flask, jsonify, request
 
+from prefq.video_store import DEFAULT_MEMORY_BUDGET, DiskVideoStore, MemoryVideoStore
+from prefq.video_transcoder import DEFAULT_TEMP_DIR, VideoTranscoder
+
 app = Flask(__name__)
 
 app.config["VIDEO_FOLDER"] = "videos"
+app.config["VIDEO_STORE"] = "disk"  # "disk" or "memory"
+app.config["VIDEO_MEMORY_BUDGET"] = DEFAULT_MEMORY_BUDGET  # bytes, "memory" only
+app.config["TRANSCODE_VIDEOS"] = False
+app.config["TRANSCODE_TEMP_DIR"] = DEFAULT_TEMP_DIR  # None: system default
 
 feedback_data = {}
 query_queue = queue.Queue()
@@ -53,15 +63,35 @@ queries_pending_response = []
 DEFAULT_HOST = "localhost"
 DEFAULT_PORT = 5000
 DEFAULT_DEBUG = False
+DEFAULT_VIDEO_STORE = "disk"
 
 
 def before_first_request():
     """Define starting routine"""
 
     # Create video folder (if necessary)
+    # (also needed by the memory store, to spill videos exceeding its budget)
     if not os.path.exists(app.config["VIDEO_FOLDER"]):
         os.mkdir(app.config["VIDEO_FOLDER"])
 
+    # Set up video storage
+    if app.config["VIDEO_STORE"] == "memory":
+        video_store = MemoryVideoStore(
+            app.config["VIDEO_FOLDER"], app.config["VIDEO_MEMORY_BUDGET"]
+        )
+    else:
+        video_store = DiskVideoStore(app.config["VIDEO_FOLDER"])
+    app.extensions["video_store"] = video_store
+
+    # Start background transcoding (if enabled)
+    video_transcoder = None
+    if app.config["TRANSCODE_VIDEOS"]:
+        video_transcoder = VideoTranscoder(
+            video_store, temp_dir=app.config["TRANSCODE_TEMP_DIR"]
+        )
+        video_transcoder.start()
+    app.extensions["video_transcoder"] = video_transcoder
+
 
 @app.route("/", methods=["GET"])
 def index():
@@ -118,12 +148,37 @@ def load_web_interface():
             "web_interface.html",
             video_filename_left=video_filename_left,
             video_filename_right=video_filename_right,
+            video_sources_left=get_video_sources(video_filename_left),
+            video_sources_right=get_video_sources(video_filename_right),
         )
 
     print("Server: [...] No data available")
     return flask.render_template("no_data_availible.html")
 
 
+def get_video_sources(filename):
+    """
+    List the original & transcoded variants of a video for the web interface.
+
+    The Feedback Client picks one of them, based on its viewport & bandwidth.
+    Returns an empty list if transcoding is disabled or no variant is finished
+    yet, in which case the original video is embedded directly.
+    """
+
+    video_transcoder = app.extensions["video_transcoder"]
+    if video_transcoder is None:
+        return []
+
+    sources = video_transcoder.sources(filename)
+    if len(sources) < 2:
+        return []
+
+    return [
+        dict(source, url=flask.url_for("serve_video", filename=source["filename"]))
+        for source in sources
+    ]
+
+
 @app.route("/videos", methods=["POST"])
 def receive_videos():
     """
@@ -152,11 +207,18 @@ def receive_videos():
     print(f"    Query ID: {query_id}")
     print("Server: ...Videos received")
 
-    left_video.save(os.path.join(app.config["VIDEO_FOLDER"], left_filename))
-    right_video.save(os.path.join(app.config["VIDEO_FOLDER"], right_filename))
+    video_store = app.extensions["video_store"]
+    video_store.put(left_filename, left_video.stream)
+    video_store.put(right_filename, right_video.stream)
     query_queue.put(query)
     print("Server: ...Videos stored locally")
 
+    # Produce lower resolution variants in the background
+    video_transcoder = app.extensions["video_transcoder"]
+    if video_transcoder is not None:
+        video_transcoder.submit(left_filename)
+        video_transcoder.submit(right_filename)
+
     print("Server: [...] Terminating receive_videos()")
     return "Server: [...] Terminating receive_videos()"
 
@@ -165,6 +227,11 @@ def receive_videos():
 def serve_video(filename):
     """Make videos accessible for feedback client (web_interface.html)"""
 
+    # Serve straight from memory, if the video store holds the video
+    video_data = app.extensions["video_store"].get(filename)
+    if video_data is not None:
+        return flask.send_file(io.BytesIO(video_data), download_name=filename)
+
     video_folder = os.path.join(os.getcwd(), app.config["VIDEO_FOLDER"])
     return flask.send_from_directory(video_folder, filename)
 
@@ -193,8 +260,14 @@ def receive_feedback():
 
     # Remove query from query list & delete locally stored videos
     queries_pending_response.remove(query)
-    os.remove(os.path.join(app.config["VIDEO_FOLDER"], left_filename))
-    os.remove(os.path.join(app.config["VIDEO_FOLDER"], right_filename))
+    # Stop transcoding first, so the worker never looks for deleted videos
+    video_transcoder = app.extensions["video_transcoder"]
+    if video_transcoder is not None:
+        video_transcoder.remove(left_filename)
+        video_transcoder.remove(right_filename)
+    video_store = app.extensions["video_store"]
+    video_store.remove(left_filename)
+    video_store.remove(right_filename)
 
     new_data = {query_id: is_left_preferred}
     feedback_data.update(new_data)
@@ -255,12 +328,35 @@ def main():
         default=DEFAULT_DEBUG,
         help="Specify debug mode (default: False)",
     )
+    parser.add_argument(
+        "--video-store",
+        type=str,
+        choices=["disk", "memory"],
+        default=DEFAULT_VIDEO_STORE,
+        help="Specify where received videos are kept (default: disk)",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=DEFAULT_MEMORY_BUDGET,
+        help="Specify the memory budget of the memory video store in bytes, "
+        f"before spilling to disk (default: {DEFAULT_MEMORY_BUDGET})",
+    )
+    parser.add_argument(
+        "--transcode",
+        action="store_true",
+        help="Transcode received videos into lower resolution variants in the "
+        "background, which the Feedback Client picks from (default: False)",
+    )
 
     args = parser.parse_args()
 
     host = args.host
     port = args.port
     debug = args.debug
+    app.config["VIDEO_STORE"] = args.video_store
+    app.config["VIDEO_MEMORY_BUDGET"] = args.memory_budget
+    app.config["TRANSCODE_VIDEOS"] = args.transcode
 
     before_first_request()
     print(f"Host: {host}, Port: {port},   Debug: {debug}\n\n")
@@ -18,6 +18,11 @@ var video_filename_right    = document.getElementById("video_filename_right").te
 
 let is_left_preferred  = null
 
+// Download bandwidth per video in bits per second, measured from previously loaded videos (null if unknown)
+let measured_bandwidth = null
+// Pick a smaller variant, if the selected one would take longer to download
+const MAX_LOAD_SECONDS = 2
+
 
 function send_data() {
     
@@ -77,6 +82,65 @@ function request_videos() {
 }
 
 
+function estimate_bandwidth() {
+
+    if (measured_bandwidth !== null)
+        {return measured_bandwidth}
+
+    // Fall back to the browser's estimate (in Mbit/s), shared by both videos
+    if (navigator.connection && navigator.connection.downlink)
+        {return navigator.connection.downlink * 1e6 / 2}
+
+    return null
+}
+
+
+function measure_bandwidth(video, source) {
+
+    const start_time = performance.now()
+
+    video.addEventListener('canplaythrough', function() {
+        const elapsed_seconds = (performance.now() - start_time) / 1000
+        if (elapsed_seconds < 0.05 || !video.duration || video.buffered.length === 0)
+            {return}    // Cached or not measurable
+
+        // Only the buffered part of the video has been downloaded so far
+        const buffered_fraction = Math.min(1, video.buffered.end(video.buffered.length - 1) / video.duration)
+        measured_bandwidth = source.size * 8 * buffered_fraction / elapsed_seconds
+    }, {once: true})
+}
+
+
+function select_video_source(video) {
+
+    // Sources are only available if the server transcodes videos, otherwise src is set by the template
+    if (!video.dataset.sources)
+        {return}
+
+    // Sources start with the original video, followed by smaller & smaller variants
+    const sources = JSON.parse(video.dataset.sources)
+    const required_width = video.clientWidth * (window.devicePixelRatio || 1)
+    const bandwidth = estimate_bandwidth()
+    const is_save_data = navigator.connection && navigator.connection.saveData
+
+    let selected = sources[0]
+    for (const source of sources.slice(1)) {
+        // Smaller resolutions don't guarantee smaller files
+        if (source.size >= selected.size)
+            {continue}
+
+        const fits_viewport = source.width >= required_width
+        const is_too_slow = bandwidth !== null && selected.size * 8 / bandwidth > MAX_LOAD_SECONDS
+        if (!(fits_viewport || is_too_slow || is_save_data))
+            {break}
+        selected = source
+    }
+
+    measure_bandwidth(video, selected)
+    video.src = selected.url
+}
+
+
 function attachEventHandlers() {
 
     // update variables
@@ -84,6 +148,11 @@ function attachEventHandlers() {
     on_right_preferred = document.getElementById('right_preferred');
     video_filename_left = document.getElementById("video_filename_left").textContent;
     video_filename_right = document.getElementById("video_filename_right").textContent;
+    left_video = document.getElementById('left_video');
+    right_video = document.getElementById('right_video');
+
+    select_video_source(left_video);
+    select_video_source(right_video);
 
     on_left_preferred.addEventListener('click', function() {
         is_left_preferred = true;
@@ -0,0 +1,130 @@
+"""
+Storage backends for the videos received by the server.
+
+    (1) DiskVideoStore:
+        Writes every video to the video folder & serves it from there.
+
+    (2) MemoryVideoStore:
+        Keeps videos in RAM, as long as they fit into a configurable byte budget.
+        Whenever the budget is exceeded, the least recently used videos are
+        spilled to the video folder.
+
+Small example clips only take a few KB, so on hardware with slow storage
+(e.g. the SD card of a Raspberry Pi) keeping them in memory avoids most of the
+synchronous disk writes & reads per query.
+"""
+
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024  # 64 MiB
+
+
+class DiskVideoStore:
+    """Store videos as files within the video folder"""
+
+    def __init__(self, video_folder):
+        self.video_folder = video_folder
+
+    def path(self, filename):
+        """Return the path of the video within the video folder"""
+
+        return os.path.join(self.video_folder, filename)
+
+    def _write(self, filename, data, stream=None):
+        """Write the data (followed by the rest of the stream) to the video folder"""
+
+        with open(self.path(filename), "wb") as video_file:
+            video_file.write(data)
+            if stream is not None:
+                shutil.copyfileobj(stream, video_file)
+
+    def put(self, filename, stream):
+        """Store the video read from a binary stream under the given filename"""
+
+        # Streamed straight to disk, without loading the whole video into memory
+        self._write(filename, b"", stream)
+
+    def get(self, filename):  # pylint: disable=unused-argument
+        """Return the video data if held in memory, else None (serve from disk)"""
+
+        return None
+
+    def remove(self, filename):
+        """Delete the stored video"""
+
+        os.remove(self.path(filename))
+
+
+class MemoryVideoStore(DiskVideoStore):
+    """
+    Store videos in memory, spilling to the video folder when over budget.
+
+    Videos are evicted in least recently used order. A video larger than the
+    whole budget is written to disk directly.
+    """
+
+    def __init__(self, video_folder, memory_budget=DEFAULT_MEMORY_BUDGET):
+        super().__init__(video_folder)
+        self.memory_budget = memory_budget
+        self.memory_usage = 0
+        self._videos = OrderedDict()
+        # Filenames of videos, which have been written to the video folder
+        self._spilled = set()
+        # waitress serves requests from multiple threads
+        self._lock = threading.Lock()
+
+    def put(self, filename, stream):
+        # Read at most one byte more than the budget, to detect oversized videos
+        data = stream.read(self.memory_budget + 1)
+
+        if len(data) > self.memory_budget:
+            with self._lock:
+                self._discard(filename)
+                self._spilled.add(filename)
+            self._write(filename, data, stream)
+            return
+
+        with self._lock:
+            self._discard(filename)
+            if filename in self._spilled:
+                # Drop the outdated copy, which was spilled before
+                self._spilled.remove(filename)
+                super().remove(filename)
+            self._videos[filename] = data
+            self.memory_usage += len(data)
+
+            # Spill while holding the lock, so that evicted videos can't be
+            # opened or removed before they have been written to disk
+            while self.memory_usage > self.memory_budget:
+                evicted_filename, evicted_data = self._videos.popitem(last=False)
+                self.memory_usage -= len(evicted_data)
+                self._spilled.add(evicted_filename)
+                self._write(evicted_filename, evicted_data)
+
+    def get(self, filename):
+        with self._lock:
+            data = self._videos.get(filename)
+            if data is not None:
+                self._videos.move_to_end(filename)
+        return data
+
+    def remove(self, filename):
+        with self._lock:
+            data = self._videos.pop(filename, None)
+            if data is not None:
+                self.memory_usage -= len(data)
+            else:
+                self._spilled.discard(filename)
+
+        if data is None:
+            super().remove(filename)
+
+    def _discard(self, filename):
+        """Drop a previous in-memory version of the video (lock must be held)"""
+
+        data = self._videos.pop(filename, None)
+        if data is not None:
+            self.memory_usage -= len(data)
@@ -0,0 +1,211 @@
+"""
+Background transcoding of received videos into a resolution ladder.
+
+Videos are served exactly as uploaded by the Query Client, which might be much
+larger than what a Feedback Client on a phone or slow link needs. Whenever
+transcoding is enabled, each received video is handed to a background worker,
+which produces lower resolution & lower bitrate variants of it:
+
+    (1) Query Client sends a pair of videos (unchanged query protocol)
+    (2) Server stores the videos & submits them to the VideoTranscoder
+    (3) VideoTranscoder writes each finished variant to the video store
+    (4) Feedback Client picks a variant based on its viewport & bandwidth
+            (behavior can be modified in web_interface.js)
+
+Until the variants of a video are finished, the original video is served.
+
+Since ffmpeg reads & writes files, transcoding writes temporary files: videos
+held in memory by the video store are copied to the temporary directory first,
+and every variant is written there before being moved into the video store.
+The temporary directory defaults to /dev/shm (if available), which is backed
+by RAM, to avoid wearing out SD cards.
+"""
+
+import os
+import queue
+import tempfile
+import threading
+
+from moviepy.video.io.VideoFileClip import VideoFileClip
+
+# (height in pixels, maximum video bitrate in bits per second), from largest to smallest
+DEFAULT_LADDER = ((360, 600_000), (180, 200_000))
+DEFAULT_TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def variant_filename(filename, height):
+    """Return the filename of a variant, e.g. 'abc-left.mp4' -> 'abc-left.360p.mp4'"""
+
+    root, _ = os.path.splitext(filename)
+    return f"{root}.{height}p.mp4"
+
+
+def transcode(source_path, target_path, height, bitrate):
+    """
+    Write a variant of the source video with the given height & maximum bitrate.
+
+    The bitrate is capped at the bitrate of the source video, scaled down by the
+    number of pixels, so that variants don't end up larger than the original.
+
+    Returns the (width, height) of the variant, or None if the source video is
+    not larger than the requested height (videos are never upscaled).
+    """
+
+    clip = VideoFileClip(source_path, audio=False)
+    try:
+        source_width, source_height = clip.size
+        if source_height <= height:
+            return None
+
+        # libx264 requires even dimensions
+        width = max(2, round(source_width * height / source_height / 2) * 2)
+
+        source_bitrate = os.path.getsize(source_path) * 8 / clip.duration
+        pixel_ratio = width * height / (source_width * source_height)
+        bitrate = str(int(min(bitrate, source_bitrate * pixel_ratio)))
+
+        # Let ffmpeg do the resizing: moviepy's resize falls back to PIL, if
+        # neither cv2 nor scipy is installed, which fails with Pillow >= 10
+        clip.write_videofile(
+            target_path,
+            codec="libx264",
+            bitrate=bitrate,
+            audio=False,
+            ffmpeg_params=[
+                "-vf",
+                f"scale={width}:{height}",
+                "-maxrate",
+                bitrate,
+                "-bufsize",
+                bitrate,
+                # Playable by all browsers (not set by moviepy for odd sizes)
+                "-pix_fmt",
+                "yuv420p",
+                # Move the metadata to the front, so playback can start before
+                # the whole file has been downloaded
+                "-movflags",
+                "+faststart",
+            ],
+            logger=None,
+        )
+        return width, height
+    finally:
+        clip.close()
+
+
+class VideoTranscoder:
+    """Produce the variants of received videos in a background worker thread"""
+
+    def __init__(self, video_store, ladder=DEFAULT_LADDER, temp_dir=DEFAULT_TEMP_DIR):
+        self.video_store = video_store
+        self.ladder = ladder
+        self.temp_dir = temp_dir
+        # Only filenames are queued, the videos themselves stay in the video store
+        self._jobs = queue.Queue()
+        # filename -> list of sources (dicts: filename, width, height, size),
+        # starting with the original video, followed by its finished variants
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._work, daemon=True)
+
+    def start(self):
+        """Start the background worker thread"""
+
+        self._worker.start()
+
+    def join(self):
+        """Block until all submitted videos have been transcoded"""
+
+        self._jobs.join()
+
+    def submit(self, filename):
+        """Queue a video of the video store for transcoding"""
+
+        # The size & dimensions of the original are unknown until it is transcoded
+        original = {"filename": filename, "width": None, "height": None, "size": None}
+        with self._lock:
+            # Drop the variants of a previous upload under the same filename
+            self._remove_variants(filename)
+            self._sources[filename] = [original]
+        self._jobs.put(filename)
+
+    def sources(self, filename):
+        """Return the original & finished variants of a video, largest first"""
+
+        with self._lock:
+            return list(self._sources.get(filename, []))
+
+    def remove(self, filename):
+        """Forget a video & delete its finished variants from the video store"""
+
+        with self._lock:
+            self._remove_variants(filename)
+            self._sources.pop(filename, None)
+
+    def _remove_variants(self, filename):
+        """Delete the finished variants from the video store (lock must be held)"""
+
+        for variant in self._sources.get(filename, [])[1:]:
+            self.video_store.remove(variant["filename"])
+
+    def _work(self):
+        while True:
+            filename = self._jobs.get()
+            try:
+                self._transcode_all(filename)
+            except Exception as exception:  # pylint: disable=broad-exception-caught
+                # Keep the worker alive, the original video is served instead
+                print(f"Server: Transcoding {filename} failed: {exception}")
+            finally:
+                self._jobs.task_done()
+
+    def _transcode_all(self, filename):
+        with tempfile.TemporaryDirectory(dir=self.temp_dir) as temp_dir:
+            with self._lock:
+                if filename not in self._sources:
+                    return  # Feedback already received
+
+                # A filename submitted twice is transcoded twice, start over
+                self._remove_variants(filename)
+                del self._sources[filename][1:]
+
+                # Transcode directly from the video folder, unless held in memory
+                data = self.video_store.get(filename)
+                if data is None:
+                    source_path = self.video_store.path(filename)
+                    self._sources[filename][0]["size"] = os.path.getsize(source_path)
+                else:
+                    source_path = os.path.join(temp_dir, filename)
+                    with open(source_path, "wb") as source_file:
+                        source_file.write(data)
+                    self._sources[filename][0]["size"] = len(data)
+
+            for height, bitrate in self.ladder:
+                with self._lock:
+                    if filename not in self._sources:
+                        return  # Feedback already received
+
+                target_filename = variant_filename(filename, height)
+                target_path = os.path.join(temp_dir, target_filename)
+                size = transcode(source_path, target_path, height, bitrate)
+                if size is None:
+                    continue
+
+                with self._lock:
+                    if filename not in self._sources:
+                        return  # Feedback received while transcoding
+
+                    # A variant is only worth serving, if it is smaller
+                    original = self._sources[filename][0]
+                    if os.path.getsize(target_path) >= original["size"]:
+                        continue
+                    with open(target_path, "rb") as target_file:
+                        self.video_store.put(target_filename, target_file)
+                    self._sources[filename].append(
+                        {
+                            "filename": target_filename,
+                            "width": size[0],
+                            "height": size[1],
+                            "size": os.path.getsize(target_path),
+                        }
+                    )
@@ -1,8 +1,120 @@
 """Basic tests"""
 
-from prefq import __version__
+import io
+import os
+
+from prefq import __version__, server
+from prefq.video_store import DiskVideoStore, MemoryVideoStore
 
 
 def test_version():
     """Check that the import is working and the version is configured properly."""
     assert __version__ == "0.1.0"
+
+
+def test_memory_video_store_spills_to_disk(tmp_path):
+    """Check that the least recently used videos are spilled once over budget."""
+    store = MemoryVideoStore(str(tmp_path), memory_budget=10)
+    store.put("a.mp4", io.BytesIO(b"aaaa"))
+    store.put("b.mp4", io.BytesIO(b"bbbb"))
+    assert store.get("a.mp4") == b"aaaa"  # "b.mp4" is now least recently used
+    store.put("c.mp4", io.BytesIO(b"cccc"))
+
+    assert store.get("b.mp4") is None
+    assert (tmp_path / "b.mp4").read_bytes() == b"bbbb"
+    assert store.get("a.mp4") == b"aaaa"
+    assert store.get("c.mp4") == b"cccc"
+    assert store.memory_usage == 8
+
+    store.remove("a.mp4")
+    store.remove("b.mp4")
+    assert store.memory_usage == 4
+    assert not (tmp_path / "b.mp4").exists()
+
+
+def test_memory_video_store_oversized_video(tmp_path):
+    """Check that videos larger than the whole budget go to disk directly."""
+    store = MemoryVideoStore(str(tmp_path), memory_budget=2)
+    store.put("a.mp4", io.BytesIO(b"aaaa"))
+
+    assert store.get("a.mp4") is None
+    assert (tmp_path / "a.mp4").read_bytes() == b"aaaa"
+    assert store.memory_usage == 0
+
+
+def test_memory_video_store_replace(tmp_path):
+    """Check that storing a video again replaces the previous version."""
+    store = MemoryVideoStore(str(tmp_path), memory_budget=4)
+    store.put("a.mp4", io.BytesIO(b"old"))
+    store.put("a.mp4", io.BytesIO(b"oversized"))
+    assert store.get("a.mp4") is None
+    assert store.memory_usage == 0
+    assert (tmp_path / "a.mp4").read_bytes() == b"oversized"
+
+    store.put("a.mp4", io.BytesIO(b"new"))
+    assert store.get("a.mp4") == b"new"
+    assert not (tmp_path / "a.mp4").exists()
+
+    store.remove("a.mp4")
+    assert store.memory_usage == 0
+    assert not list(tmp_path.iterdir())
+
+
+def test_disk_video_store(tmp_path):
+    """Check that the disk store writes, serves from & removes the video folder."""
+    store = DiskVideoStore(str(tmp_path))
+    store.put("a.mp4", io.BytesIO(b"aaaa"))
+    assert store.get("a.mp4") is None
+    assert (tmp_path / "a.mp4").read_bytes() == b"aaaa"
+
+    store.remove("a.mp4")
+    assert not (tmp_path / "a.mp4").exists()
+
+
+def test_server_memory_video_store(tmp_path, monkeypatch):
+    """Check that a query is stored, served & removed without touching the disk."""
+    monkeypatch.setitem(server.app.config, "VIDEO_FOLDER", str(tmp_path))
+    monkeypatch.setitem(server.app.config, "VIDEO_STORE", "memory")
+    monkeypatch.setitem(server.app.config, "TRANSCODE_VIDEOS", False)
+    server.before_first_request()
+    client = server.app.test_client()
+
+    example_dir = os.path.join(
+        os.path.dirname(__file__), "..", "prefq", "examples", "video-examples"
+    )
+    with open(os.path.join(example_dir, "01.mp4"), "rb") as video_file:
+        video_data = video_file.read()
+
+    response = client.post(
+        "/videos",
+        data={
+            "query_id": (io.BytesIO(b"application/json"), '"q1"'),
+            "left_video": (io.BytesIO(video_data), "01.mp4"),
+            "right_video": (io.BytesIO(video_data), "01.mp4"),
+        },
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    assert client.get("/").status_code == 200
+
+    response = client.get("/videos/q1-left.mp4")
+    assert response.status_code == 200
+    assert response.mimetype == "video/mp4"
+    assert response.data == video_data
+
+    response = client.get("/videos/q1-left.mp4", headers={"Range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.data == video_data[:100]
+
+    response = client.post(
+        "/feedback",
+        json={
+            "is_left_preferred": True,
+            "video_filename_left": "q1-left.mp4",
+            "video_filename_right": "q1-right.mp4",
+        },
+    )
+    assert response.status_code == 200
+    assert client.get("/feedback").json == {"q1": True}
+    assert server.app.extensions["video_store"].memory_usage == 0
+    assert not list(tmp_path.iterdir())
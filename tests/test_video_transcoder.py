@@ -0,0 +1,59 @@
+"""Tests for the background transcoding of videos"""
+
+import os
+import shutil
+
+from prefq import server
+from prefq.video_store import DiskVideoStore
+from prefq.video_transcoder import VideoTranscoder, transcode, variant_filename
+
+EXAMPLE_VIDEO = os.path.join(
+    os.path.dirname(__file__), "..", "prefq", "examples", "video-examples", "05.mp4"
+)
+
+
+def test_variant_filename():
+    """Check that variants are named after their original & height."""
+    assert variant_filename("abc-left.mp4", 360) == "abc-left.360p.mp4"
+    assert variant_filename("abc-right.webm", 180) == "abc-right.180p.mp4"
+
+
+def test_transcode(tmp_path):
+    """Check that a bundled example clip (600x400) is really transcoded."""
+    target_path = str(tmp_path / "05.180p.mp4")
+    assert transcode(EXAMPLE_VIDEO, target_path, 180, 200_000) == (270, 180)
+    assert 0 < os.path.getsize(target_path) < os.path.getsize(EXAMPLE_VIDEO)
+
+
+def test_transcode_no_upscale(tmp_path):
+    """Check that videos are never upscaled."""
+    target_path = str(tmp_path / "05.720p.mp4")
+    assert transcode(EXAMPLE_VIDEO, target_path, 720, 1_000_000) is None
+    assert not os.path.exists(target_path)
+
+
+def test_video_transcoder_remove(tmp_path):
+    """Check that removing a video deletes its finished variants from the store."""
+    shutil.copy(EXAMPLE_VIDEO, tmp_path / "q-left.mp4")
+    video_transcoder = VideoTranscoder(DiskVideoStore(str(tmp_path)))
+    video_transcoder.start()
+    video_transcoder.submit("q-left.mp4")
+    video_transcoder.join()
+
+    # Only variants smaller than the original are kept
+    original, *variants = video_transcoder.sources("q-left.mp4")
+    assert variants
+    assert all(variant["size"] < original["size"] for variant in variants)
+    for variant in variants:
+        assert (tmp_path / variant["filename"]).exists()
+
+    video_transcoder.remove("q-left.mp4")
+    assert not video_transcoder.sources("q-left.mp4")
+    assert sorted(os.listdir(tmp_path)) == ["q-left.mp4"]
+
+
+def test_get_video_sources_without_transcoding():
+    """Check that the original video is embedded, if transcoding is disabled."""
+    server.app.extensions["video_transcoder"] = None
+    with server.app.test_request_context():
+        assert server.get_video_sources("q-left.mp4") == []